@@ -0,0 +1,263 @@
+"""
+Backtest module: replay historical S2 streams against many candidate (k1, k2) designs.
+
+Command-line usage:
+    python -m src.backtest convert --data data/historical.csv --out data/historical_s2
+    python -m src.backtest run --history data/historical_s2 --k1 3.0 4.37021 --k2 1.5 1.92006 \
+        --out outputs/backtest.csv
+
+Notes:
+- `convert` streams the CSV once into a binary column store: s2.f8 (float64),
+  machine.i4 (int32 codes) and meta.json (row count, machine names, modal n overall
+  and per machine, and per-machine in-control S2 mean as the sigma2 estimate).
+- Limits are built per machine from that machine's modal subgroup size, as in
+  fleet.estimate_charts, so machines with different n are classified correctly.
+- `run` memory-maps the columns and evaluates every design in a single chunked pass,
+  so histories larger than RAM are supported. Each chunk is sorted once per machine
+  and every design's limits are located by binary search.
+- Under the repetitive-sampling rule each subgroup is classified independently
+  (out / in / repeat); a repeat only means the next subgroup continues the same
+  decision. Counting the three classes per design and machine is therefore exact
+  and needs no per-design state across chunks.
+"""
+
+import argparse
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+from src import simulator
+
+META_FILE = "meta.json"
+S2_FILE = "s2.f8"
+MACHINE_FILE = "machine.i4"
+
+
+def convert_history(csv_path: str, out_dir: str, chunksize: int = 1_000_000) -> dict:
+    """
+    Convert a historical.csv-style file into memory-mappable binary columns.
+    The CSV is read in chunks, so conversion memory does not grow with the file.
+    Returns the metadata dict written to meta.json.
+    """
+    import pandas as pd
+
+    os.makedirs(out_dir, exist_ok=True)
+    machines: Dict[str, int] = {}
+    n_counts: Dict[int, int] = {}
+    machine_n_counts: Dict[int, Dict[int, int]] = {}
+    # Per machine code: [in-control S2 sum, in-control rows, S2 sum, rows]
+    s2_sums: Dict[int, List[float]] = {}
+    rows = 0
+    with open(os.path.join(out_dir, S2_FILE), "wb") as f_s2, open(os.path.join(out_dir, MACHINE_FILE), "wb") as f_m:
+        columns = {"n", "S2", "machine", "state_label"}
+        for chunk in pd.read_csv(csv_path, usecols=lambda c: c in columns, chunksize=chunksize):
+            names = chunk["machine"].astype(str)
+            for name in names.unique():
+                machines.setdefault(name, len(machines))
+            codes = names.map(machines).to_numpy(dtype=np.int32)
+            chunk["S2"].to_numpy(dtype=np.float64).tofile(f_s2)
+            codes.tofile(f_m)
+            for value, count in chunk["n"].value_counts().items():
+                n_counts[int(value)] = n_counts.get(int(value), 0) + int(count)
+            pairs = pd.DataFrame({"machine": codes, "n": chunk["n"].to_numpy()})
+            for (code, value), count in pairs.value_counts().items():
+                per_machine = machine_n_counts.setdefault(int(code), {})
+                per_machine[int(value)] = per_machine.get(int(value), 0) + int(count)
+            # Same in-control rule as fleet.estimate_charts: state_label when present, else every row
+            ic = (chunk["state_label"] == "in-control").to_numpy() if "state_label" in chunk else True
+            s2 = chunk["S2"].to_numpy(dtype=np.float64)
+            valid = ~np.isnan(s2)
+            s2 = np.where(valid, s2, 0.0)
+            ic = ic & valid
+            part = pd.DataFrame({"machine": codes, "ic_s2": np.where(ic, s2, 0.0), "ic_rows": ic,
+                                 "s2": s2, "rows": valid}).groupby("machine").sum()
+            for code, row in part.iterrows():
+                acc = s2_sums.setdefault(int(code), [0.0, 0, 0.0, 0])
+                acc[0] += row["ic_s2"]
+                acc[1] += int(row["ic_rows"])
+                acc[2] += row["s2"]
+                acc[3] += int(row["rows"])
+            rows += len(chunk)
+
+    meta = {
+        "rows": rows,
+        "machines": list(machines),
+        "n": max(n_counts, key=n_counts.get) if n_counts else None,
+        # Modal subgroup size per machine, in "machines" order
+        "machine_n": [max(machine_n_counts[code], key=machine_n_counts[code].get) for code in range(len(machines))],
+        # In-control S2 mean per machine (sigma2 estimate), in "machines" order
+        "machine_sigma2": [],
+        "source": os.path.abspath(csv_path),
+    }
+    for name, code in machines.items():
+        ic_s2, ic_rows, all_s2, all_rows = s2_sums.get(code, [0.0, 0, 0.0, 0])
+        if ic_rows:
+            meta["machine_sigma2"].append(float(ic_s2 / ic_rows))
+        else:
+            print(f"Warning: no in-control rows for machine {name}; its sigma2 is estimated from all rows")
+            meta["machine_sigma2"].append(float(all_s2 / all_rows) if all_rows else None)
+    with open(os.path.join(out_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"Converted {rows} rows ({len(machines)} machines) to {out_dir}")
+    return meta
+
+
+def open_history(history_dir: str):
+    """Memory-map a converted history. Returns (s2, machine_codes, meta)."""
+    with open(os.path.join(history_dir, META_FILE)) as f:
+        meta = json.load(f)
+    rows = meta["rows"]
+    s2 = np.memmap(os.path.join(history_dir, S2_FILE), dtype=np.float64, mode="r", shape=(rows,))
+    machine = np.memmap(os.path.join(history_dir, MACHINE_FILE), dtype=np.int32, mode="r", shape=(rows,))
+    return s2, machine, meta
+
+
+def _count_classes(x: np.ndarray, U1, L1, U2, L2):
+    """
+    Count out / terminal classifications of the values x for every design.
+    x is sorted once; each limit is then located with searchsorted, so the cost is
+    O(m log m + designs * log m) instead of O(designs * m).
+    """
+    xs = np.sort(x[~np.isnan(x)])
+
+    def count_le(v):
+        return np.searchsorted(xs, v, side="right")
+
+    def count_lt(v):
+        return np.searchsorted(xs, v, side="left")
+
+    out = (len(xs) - count_lt(U1)) + count_le(L1)
+    # In-control band [L2, U2] excluding values already counted as out (x <= L1 when L1 == L2 == 0)
+    inside = count_le(U2) - np.maximum(count_lt(L2), count_le(L1))
+    return len(xs), out, out + inside
+
+
+def backtest(history_dir: str, k1, k2, n: Optional[int] = None, sigma2=None,
+             chunk_rows: int = 5_000_000) -> Dict[str, object]:
+    """
+    Replay the history against every design (k1[i], k2[i]) in one pass.
+    sigma2 is the in-control variance, either a scalar or one value per machine
+    (in meta["machines"] order); S2 values are scaled by it before classification.
+    By default each machine's in-control S2 mean from meta.json is used.
+    Limits use each machine's modal n from meta.json unless n overrides it for all.
+    NaN S2 values are skipped.
+    Returns per (design, machine) arrays:
+        samples, alarms, repeats, decisions,
+        ASN (observations per decision = n * samples / decisions),
+        ARL (decisions per alarm, comparable to the analytic ARL),
+        time_to_signal (subgroups per alarm),
+    plus "k1", "k2", "machines" and "n" (subgroup size per machine).
+    """
+    s2, machine, meta = open_history(history_dir)
+    machines = meta["machines"]
+    n_machines = len(machines)
+    if n is None:
+        # Histories converted before per-machine n was stored fall back to the global mode
+        n = meta.get("machine_n", [meta["n"]] * n_machines)
+    n = np.broadcast_to(np.asarray(n, dtype=int), (n_machines,))
+    k1 = np.atleast_1d(np.asarray(k1, dtype=float))
+    k2 = np.atleast_1d(np.asarray(k2, dtype=float))
+    n_designs = len(k1)
+    if sigma2 is None:
+        # Histories converted before per-machine sigma2 was stored are taken as nominal (1.0)
+        sigma2 = [1.0 if v is None else v for v in meta.get("machine_sigma2", [1.0] * n_machines)]
+    scale = np.broadcast_to(np.asarray(sigma2, dtype=float), (n_machines,))
+
+    # Shape (n_designs, n_machines): limits per design and machine subgroup size
+    U1, L1, U2, L2 = simulator.limit_arrays(1.0, n[None, :], k1[:, None], k2[:, None])
+
+    samples = np.zeros(n_machines, dtype=np.int64)
+    alarms = np.zeros((n_designs, n_machines), dtype=np.int64)
+    decisions = np.zeros((n_designs, n_machines), dtype=np.int64)
+
+    for start in range(0, len(s2), chunk_rows):
+        codes = np.asarray(machine[start:start + chunk_rows])
+        x = np.asarray(s2[start:start + chunk_rows]) / scale[codes]
+        # Group the chunk by machine, then count every design per machine
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(n_machines + 1))
+        x = x[order]
+        for j in range(n_machines):
+            if bounds[j] == bounds[j + 1]:
+                continue
+            m, out, terminal = _count_classes(x[bounds[j]:bounds[j + 1]], U1[:, j], L1[:, j], U2[:, j], L2[:, j])
+            samples[j] += m
+            alarms[:, j] += out
+            decisions[:, j] += terminal
+
+    samples = np.broadcast_to(samples, (n_designs, n_machines))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        asn = np.where(decisions > 0, n * samples / decisions, np.inf)
+        arl = np.where(alarms > 0, decisions / alarms, np.inf)
+        tts = np.where(alarms > 0, samples / alarms, np.inf)
+
+    return {
+        "k1": k1, "k2": k2, "machines": machines, "n": n.tolist(),
+        "samples": samples, "alarms": alarms, "repeats": samples - decisions,
+        "decisions": decisions, "ASN": asn, "ARL": arl, "time_to_signal": tts,
+    }
+
+
+def to_frame(result: Dict[str, object]):
+    """Long-format DataFrame with one row per (design, machine) plus an 'ALL' row per design."""
+    import pandas as pd
+
+    rows = []
+    n = np.asarray(result["n"])
+    for i, (k1, k2) in enumerate(zip(result["k1"], result["k2"])):
+        for j, name in enumerate(result["machines"] + ["ALL"]):
+            if name == "ALL":
+                samples = int(result["samples"][i].sum())
+                alarms = int(result["alarms"][i].sum())
+                decisions = int(result["decisions"][i].sum())
+                observations = int((n * result["samples"][i]).sum())
+            else:
+                samples = int(result["samples"][i, j])
+                alarms = int(result["alarms"][i, j])
+                decisions = int(result["decisions"][i, j])
+                observations = int(n[j]) * samples
+            rows.append({
+                "k1": k1, "k2": k2, "machine": name,
+                "samples": samples, "alarms": alarms, "repeats": samples - decisions,
+                "decisions": decisions,
+                "ASN": observations / decisions if decisions else np.inf,
+                "ARL": decisions / alarms if alarms else np.inf,
+                "time_to_signal": samples / alarms if alarms else np.inf,
+            })
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest S^2 chart designs on historical S2 streams.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("convert", help="Convert historical CSV to memory-mappable columns")
+    p.add_argument("--data", type=str, default="data/historical.csv")
+    p.add_argument("--out", type=str, default="data/historical_s2")
+    p.add_argument("--chunksize", type=int, default=1_000_000)
+
+    p = sub.add_parser("run", help="Backtest a vector of (k1, k2) designs")
+    p.add_argument("--history", type=str, default="data/historical_s2")
+    p.add_argument("--k1", type=float, nargs="+", required=True)
+    p.add_argument("--k2", type=float, nargs="+", required=True)
+    p.add_argument("--sigma2", type=float, default=None,
+                   help="In-control variance for every machine (default: per-machine estimate from convert)")
+    p.add_argument("--out", type=str, default="outputs/backtest.csv")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        convert_history(args.data, args.out, args.chunksize)
+        return
+
+    if len(args.k1) != len(args.k2):
+        parser.error("--k1 and --k2 need the same number of values")
+    df = to_frame(backtest(args.history, args.k1, args.k2, sigma2=args.sigma2))
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    df.to_csv(args.out, index=False)
+    print(df[df["machine"] == "ALL"].to_string(index=False))
+    print(f"Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
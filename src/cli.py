@@ -0,0 +1,113 @@
+"""
+s2chart command-line interface.
+Single entry point for the S^2 chart tools with deferred heavy imports.
+
+Command-line usage:
+    python -m src limits --n 5 --k1 4.37021 --k2 1.92006
+    python -m src decide --n 5 --k1 4.37021 --k2 1.92006 0.8 2.9
+    python -m src oc --n 5 --k1 4.37021 --k2 1.92006 --c 1.5
+    python -m src generate --out data/historical.csv
+    python -m src train --data data/historical.csv --out models/surrogate.joblib
+    python -m src optimize --mode analytical --out outputs/optimization_results.json
+    python -m src evaluate
+    python -m src serve --port 8765
+    python -m src report
+    python -m src backtest run --k1 3.0 4.37021 --k2 1.5 1.92006
+    python -m src fleet --data data/historical.csv
+
+Notes:
+- Only argparse/json are imported here. `limits` and `decide` need numpy alone;
+  scipy, pandas, sklearn, optuna and matplotlib are imported by the subcommands
+  that actually use them.
+- Pipeline subcommands forward their remaining arguments to the `main()` of the
+  corresponding module, so their options are unchanged.
+"""
+
+import argparse
+import importlib
+import json
+import sys
+
+# subcommand -> module whose main(argv) handles it
+FORWARDED_COMMANDS = {
+    "generate": "src.data_generation",
+    "train": "src.surrogate",
+    "optimize": "src.optimizer",
+    "evaluate": "src.evaluate",
+    "serve": "src.service",
+    "report": "src.reporting",
+    "backtest": "src.backtest",
+    "fleet": "src.fleet",
+}
+
+
+def _add_design_args(parser):
+    parser.add_argument("--n", type=int, required=True, help="Subgroup size")
+    parser.add_argument("--k1", type=float, required=True, help="Outer limit multiplier")
+    parser.add_argument("--k2", type=float, required=True, help="Inner limit multiplier")
+    parser.add_argument("--sigma2", type=float, default=1.0, help="In-control variance")
+
+
+def _cmd_limits(args):
+    from src import simulator
+    return simulator.control_limits(args.sigma2, args.n, args.k1, args.k2)
+
+
+def _cmd_decide(args):
+    from src import simulator
+    # S2 values are scaled to nominal sigma2=1 by simulate_run
+    values = [s2 / args.sigma2 for s2 in args.s2]
+    samples, outcome = simulator.simulate_run(values, args.n, args.k1, args.k2)
+    return {"samples": samples, "outcome": outcome}
+
+
+def _cmd_oc(args):
+    from src import simulator
+    res = simulator.overall_oc(args.sigma2, args.n, args.k1, args.k2, c=args.c)
+    return {key: float(value) for key, value in res.items()}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="s2chart", description="Repetitive-sampling S^2 control chart tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("limits", help="Print outer and inner control limits")
+    _add_design_args(p)
+    p.set_defaults(func=_cmd_limits)
+
+    p = sub.add_parser("decide", help="Apply the repetitive-sampling decision rule to S2 values")
+    _add_design_args(p)
+    p.add_argument("s2", type=float, nargs="+", help="S2 values in sampling order")
+    p.set_defaults(func=_cmd_decide)
+
+    p = sub.add_parser("oc", help="Print analytic operating characteristics (ARL, ASN)")
+    _add_design_args(p)
+    p.add_argument("--c", type=float, default=1.0, help="Variance shift multiplier")
+    p.set_defaults(func=_cmd_oc)
+
+    for name, module in FORWARDED_COMMANDS.items():
+        # add_help=False so that -h reaches the forwarded module's own parser
+        p = sub.add_parser(name, help=f"Run {module} (options forwarded)", add_help=False)
+        p.set_defaults(module=module)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+
+    if args.command in FORWARDED_COMMANDS:
+        # argparse derives prog from sys.argv[0]; show "s2chart <command>" in usage/errors
+        sys.argv[0] = f"{parser.prog} {args.command}"
+        importlib.import_module(args.module).main(extra)
+        return
+    if extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+
+    json.dump(args.func(args), sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
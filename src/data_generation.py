@@ -12,10 +12,8 @@ Notes:
 
 import argparse
 import numpy as np
-import pandas as pd
 import os
 from datetime import datetime, timedelta
-from tqdm import trange
 
 
 def generate_historical(n_subgroups=5000, n=5, ic_fraction=0.8, sigma2=1.0, seed=42):
@@ -24,6 +22,9 @@ def generate_historical(n_subgroups=5000, n=5, ic_fraction=0.8, sigma2=1.0, seed
     produced by applying variance multipliers c sampled from a set.
     Returns pandas DataFrame.
     """
+    import pandas as pd
+    from tqdm import trange
+
     rng = np.random.RandomState(seed)
     rows = []
     timestamp = datetime.now()
@@ -57,13 +58,13 @@ def generate_historical(n_subgroups=5000, n=5, ic_fraction=0.8, sigma2=1.0, seed
     return df
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Generate synthetic historical subgroups for S2 chart experiments.")
     parser.add_argument("--out", type=str, default="data/historical.csv", help="Output CSV path")
     parser.add_argument("--n_subgroups", type=int, default=5000, help="Number of subgroups to generate")
     parser.add_argument("--n", type=int, default=5, help="Subgroup size")
     parser.add_argument("--seed", type=int, default=42, help="Random seed")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     df = generate_historical(n_subgroups=args.n_subgroups, n=args.n, seed=args.seed)
     os.makedirs(os.path.dirname(args.out), exist_ok=True)
     df.to_csv(args.out, index=False)
@@ -0,0 +1,138 @@
+"""
+Fleet redesign module: redesign every (machine[, characteristic]) chart from one history file.
+
+Command-line usage:
+    python -m src.fleet --data data/historical.csv --out outputs/fleet_designs.csv
+    python -m src.fleet --data data/historical.csv --surrogate models/surrogate.joblib --workers 8
+
+Notes:
+- The history is read once in chunks. Per chart it accumulates the in-control S2
+  mean (sigma2 estimate) and the modal subgroup size n.
+- ARL and ASN do not depend on sigma2, so the optimal (k1, k2) depends only on
+  n (for a fixed ARL0 target and shift). One design is solved per distinct n,
+  concurrently in threads that share the loaded surrogate. The per-chart limits
+  are then scaled by each chart's own sigma2.
+- Contexts outside a surrogate's n range are screened with exact evaluations.
+"""
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+from src import optimizer
+from src import simulator
+
+CHART_KEYS = ["machine", "characteristic"]
+
+
+def estimate_charts(data_path: str, chunksize: int = 1_000_000):
+    """
+    Estimate (n, sigma2) for every chart in one streaming pass over the CSV.
+    Charts are keyed by `machine` (and `characteristic` when that column exists).
+    Only in-control rows are used when a `state_label` column is present; charts
+    without any in-control rows are skipped and reported.
+    Returns a DataFrame with the chart keys, n, sigma2, ic_rows and rows.
+    """
+    import pandas as pd
+
+    sums = None
+    n_counts = None
+    for chunk in pd.read_csv(data_path, chunksize=chunksize):
+        keys = [k for k in CHART_KEYS if k in chunk.columns]
+        chunk["_ic"] = (chunk["state_label"] == "in-control") if "state_label" in chunk.columns else True
+        chunk["_ic_s2"] = chunk["S2"].where(chunk["_ic"], 0.0)
+        part = chunk.groupby(keys).agg(rows=("S2", "size"), ic_rows=("_ic", "sum"), ic_s2=("_ic_s2", "sum"))
+        sums = part if sums is None else sums.add(part, fill_value=0)
+        part_n = chunk.groupby(keys + ["n"]).size()
+        n_counts = part_n if n_counts is None else n_counts.add(part_n, fill_value=0)
+
+    if sums is None:
+        raise ValueError(f"No rows found in {data_path}.")
+    if (sums["ic_rows"] == 0).any():
+        missing = list(sums.index[sums["ic_rows"] == 0])
+        print(f"Skipping {len(missing)} chart(s) with no in-control data: {missing}")
+        sums = sums[sums["ic_rows"] > 0]
+        if sums.empty:
+            raise ValueError(f"No in-control data for any chart in {data_path}.")
+
+    modal_n = n_counts.reset_index(name="count").sort_values("count", ascending=False)
+    modal_n = modal_n.drop_duplicates(subset=keys).set_index(keys)["n"]
+    charts = sums.assign(sigma2=sums["ic_s2"] / sums["ic_rows"], n=modal_n.astype(int))
+    return charts.drop(columns="ic_s2").astype({"rows": int, "ic_rows": int}).reset_index()
+
+
+def _solve_context(n, surrogate_artifact, target_arl0, shift, k1_max):
+    """Solve one (n, target, shift) context; sigma2 is irrelevant so 1.0 is used."""
+    # hybrid_search screens exactly when the surrogate does not cover n or k1_max
+    k1, k2, evaluations = optimizer.hybrid_search(surrogate_artifact, n, 1.0, target_arl0, shift, k1_max=k1_max)
+    covered = optimizer.surrogate_covers(surrogate_artifact, n, k1_max)
+    return {"n": n, "k1": k1, "k2": k2, "screen": "surrogate" if covered else "exact",
+            "exact_evaluations": evaluations}
+
+
+def redesign_fleet(charts, target_arl0: float = 370, shift: float = 1.5, surrogate_artifact=None,
+                   workers: Optional[int] = None, k1_max: float = 6.0):
+    """
+    Redesign every chart in `charts` (output of estimate_charts).
+    One hybrid_search per distinct n runs in a thread pool; the per-chart limits and
+    operating characteristics are then computed with single batched calls.
+    k1_max bounds the search (raise it for high ARL0 targets). Contexts whose best
+    design misses target_arl0 are flagged with feasible=False and reported.
+    Returns a DataFrame with one row per chart, including how its context was screened
+    ("surrogate" or "exact") and the exact evaluations that context used.
+    """
+    import pandas as pd
+
+    contexts: List[int] = sorted(int(n) for n in charts["n"].unique())
+    print(f"Redesigning {len(charts)} charts over {len(contexts)} distinct context(s): n={contexts}")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        solved = list(pool.map(lambda n: _solve_context(n, surrogate_artifact, target_arl0, shift, k1_max), contexts))
+    designs = pd.DataFrame(solved).set_index("n")
+
+    out = charts.copy()
+    for col in ("k1", "k2", "screen", "exact_evaluations"):
+        out[col] = designs.loc[out["n"], col].to_numpy()
+    sigma2, n, k1, k2 = (out[col].to_numpy(dtype=float) for col in ("sigma2", "n", "k1", "k2"))
+    out["UCL1"], out["LCL1"], out["UCL2"], out["LCL2"] = simulator.limit_arrays(sigma2, n, k1, k2)
+    oc = simulator.overall_oc_batch(sigma2[:, None], n[:, None], k1[:, None], k2[:, None], np.array([1.0, shift]))
+    out["ARL0"] = oc["ARL"][:, 0]
+    out["ARL1"] = oc["ARL"][:, 1]
+    out["ASN1"] = oc["ASN"][:, 1]
+    out["shift"] = shift
+    out["feasible"] = out["ARL0"] >= target_arl0
+    infeasible = sorted(int(n) for n in out.loc[~out["feasible"], "n"].unique())
+    if infeasible:
+        print(f"Warning: no design reaches ARL0 >= {target_arl0} for n={infeasible} "
+              f"(k1_max={k1_max}); raise --k1_max")
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Redesign every chart in a historical file.")
+    parser.add_argument("--data", type=str, default="data/historical.csv")
+    parser.add_argument("--out", type=str, default="outputs/fleet_designs.csv")
+    parser.add_argument("--surrogate", type=str, help="Optional surrogate used to screen candidate designs")
+    parser.add_argument("--target_arl0", type=float, default=370)
+    parser.add_argument("--shift", type=float, default=1.5)
+    parser.add_argument("--k1_max", type=float, default=6.0, help="Upper bound for k1 (raise for high ARL0 targets)")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent context solves (default: thread pool default)")
+    parser.add_argument("--chunksize", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    surrogate_artifact = None
+    if args.surrogate:
+        import joblib
+        surrogate_artifact = joblib.load(args.surrogate)
+
+    charts = estimate_charts(args.data, chunksize=args.chunksize)
+    result = redesign_fleet(charts, args.target_arl0, args.shift, surrogate_artifact, args.workers, args.k1_max)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    result.to_csv(args.out, index=False)
+    print(result.to_string(index=False))
+    print(f"Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,21 @@
 """
 Optimizer module.
 Uses Optuna to find optimal (k1, k2) parameters.
-Supports 'analytical' (exact) and 'surrogate' (ML-based) evaluation.
+Supports 'analytical' (exact) and 'surrogate' (ML-based) evaluation, and a
+'hybrid' mode that screens with the surrogate and refines with exact evaluations.
+A multi-context surrogate can also redesign many subgroup sizes in one batched pass
+(see design_many).
 """
 
 import argparse
-import optuna
 import numpy as np
-import joblib
 import json
 from src import simulator
+from src import surrogate
 
-def objective(trial, mode, surrogate_artifact, target_arl0, shift, n, sigma2):
+def objective(trial, mode, surrogate_artifact, target_arl0, shift, n, sigma2, k1_max=6.0):
     # Suggest parameters
-    k1 = trial.suggest_float("k1", 1.5, 6.0)
+    k1 = trial.suggest_float("k1", 1.5, k1_max)
     # k2 must be < k1. We can enforce this by sampling k2 from [0.1, k1).
     k2 = trial.suggest_float("k2", 0.1, k1 - 0.01)
     
@@ -29,15 +31,12 @@ def objective(trial, mode, surrogate_artifact, target_arl0, shift, n, sigma2):
         asn1 = res1["ASN"]
         
     elif mode == "surrogate":
-        model = surrogate_artifact["model"]
-        # Predict for c=1.0
-        # Input shape: [[k1, k2, c]]
-        p0 = model.predict([[k1, k2, 1.0]])[0] # [log_arl, asn]
-        p1 = model.predict([[k1, k2, shift]])[0]
+        # Predict c=1.0 and c=shift in a single batched call
+        arl, asn = surrogate.predict(surrogate_artifact, k1, k2, [1.0, shift], n=n)
         
-        arl0 = 10**p0[0]
-        arl1 = 10**p1[0]
-        asn1 = p1[1]
+        arl0 = arl[0]
+        arl1 = arl[1]
+        asn1 = asn[1]
         
     else:
         raise ValueError(f"Unknown mode {mode}")
@@ -56,36 +55,143 @@ def objective(trial, mode, surrogate_artifact, target_arl0, shift, n, sigma2):
     # Could also mix with ASN: minimize ARL1 + lambda * ASN
     return arl1
 
-def run_optimization(mode, surrogate_path, out_path, n_trials=100, target_arl0=370, shift=1.5):
+def _penalized(arl0, arl1, target_arl0):
+    """Vectorized version of the objective's penalty: ARL1 if feasible, else 1e4 + deficit."""
+    return np.where(arl0 >= target_arl0, arl1, 1e4 + (target_arl0 - arl0))
+
+def _sample_designs(rng, size, k1_lo=1.5, k1_hi=6.0):
+    """Random (k1, k2) designs over the same space as objective()."""
+    k1 = rng.uniform(k1_lo, k1_hi, size=size)
+    k2 = rng.uniform(0.1, k1 - 0.01)
+    return k1, k2
+
+def _k1_range(surrogate_artifact):
+    # Artifacts saved before k1_range was stored were trained on the default range
+    return surrogate_artifact.get("k1_range", [1.5, 6.0])
+
+def surrogate_covers(surrogate_artifact, n, k1_max=6.0) -> bool:
+    """True when the surrogate was trained for subgroup size n and k1 up to k1_max."""
+    if surrogate_artifact is None or k1_max > _k1_range(surrogate_artifact)[1]:
+        return False
+    if "n" in surrogate_artifact["feature_names"]:
+        n_lo, n_hi = surrogate_artifact["n_range"]
+        return n_lo <= n <= n_hi
+    return surrogate_artifact["n"] == n
+
+def hybrid_search(surrogate_artifact, n, sigma2, target_arl0=370, shift=1.5, n_screen=5000, top_k=3,
+                  n_local=8, n_iter=20, radius=0.4, min_radius=1e-3, seed=42, k1_max=6.0):
+    """
+    Two-stage search:
+      1. Screen n_screen random designs with one batched surrogate prediction and keep
+         the top_k by predicted ARL1 among those predicted to meet the ARL0 target.
+         With surrogate_artifact=None, or when the surrogate does not cover n or k1_max
+         (see surrogate_covers), one batched exact call is used instead.
+      2. Refine each of them with exact overall_oc evaluations in a trust region:
+         n_local designs are drawn around every incumbent per iteration (one batched
+         exact call for all regions); a region recenters and grows on improvement and
+         shrinks otherwise. The ARL0 constraint is always checked exactly.
+    Returns (k1, k2, exact_evaluations), counting one evaluation per (design, c).
+    """
+    rng = np.random.RandomState(seed)
+    k1, k2 = _sample_designs(rng, n_screen, k1_hi=k1_max)
+    if not surrogate_covers(surrogate_artifact, n, k1_max):
+        surrogate_artifact = None
+
+    def exact(k1, k2):
+        res = simulator.overall_oc_batch(sigma2, n, k1[..., None], k2[..., None], np.array([1.0, shift]))
+        return _penalized(res["ARL"][..., 0], res["ARL"][..., 1], target_arl0)
+
+    if surrogate_artifact is None:
+        screen_f = exact(k1, k2)
+        evaluations = 2 * n_screen
+    else:
+        arl, _ = surrogate.predict(surrogate_artifact, k1[:, None], k2[:, None], np.array([[1.0, shift]]), n=n)
+        screen_f = _penalized(arl[:, 0], arl[:, 1], target_arl0)
+        evaluations = 0
+    order = np.argsort(screen_f)[:top_k]
+
+    inc_k1, inc_k2 = k1[order], k2[order]
+    inc_f = exact(inc_k1, inc_k2)
+    evaluations += 2 * len(order)
+    r = np.full(len(order), radius)
+
+    for _ in range(n_iter):
+        active = r >= min_radius
+        if not active.any():
+            break
+        # Candidates around every incumbent: shape (top_k, n_local)
+        c_k1 = inc_k1[:, None] + r[:, None] * rng.uniform(-1, 1, size=(len(order), n_local))
+        c_k2 = inc_k2[:, None] + r[:, None] * rng.uniform(-1, 1, size=(len(order), n_local))
+        c_k1 = np.clip(c_k1, 1.5, k1_max)
+        c_k2 = np.clip(c_k2, 0.1, c_k1 - 0.01)
+        f = exact(c_k1[active], c_k2[active])
+        evaluations += 2 * f.size
+
+        best = np.argmin(f, axis=1)
+        idx = np.flatnonzero(active)
+        best_f = f[np.arange(len(idx)), best]
+        improved = best_f < inc_f[idx]
+        moved = idx[improved]
+        inc_k1[moved] = c_k1[moved, best[improved]]
+        inc_k2[moved] = c_k2[moved, best[improved]]
+        inc_f[moved] = best_f[improved]
+        r[moved] = np.minimum(r[moved] * 2.0, radius)
+        r[idx[~improved]] *= 0.5
+
+    winner = int(np.argmin(inc_f))
+    return float(inc_k1[winner]), float(inc_k2[winner]), evaluations
+
+def run_optimization(mode, surrogate_path, out_path, n_trials=100, target_arl0=370, shift=1.5, n=None, sigma2=None,
+                     mc_verify=False, k1_max=6.0):
     print(f"Starting optimization in mode: {mode}")
     
     surrogate_artifact = None
-    if mode == "surrogate":
+    # Hybrid mode screens exactly when no surrogate is given
+    if mode == "surrogate" or (mode == "hybrid" and surrogate_path):
+        # joblib (and sklearn, when unpickling the model) are only needed here
+        import joblib
         surrogate_artifact = joblib.load(surrogate_path)
-        n = surrogate_artifact["n"]
-        sigma2 = surrogate_artifact["sigma2"]
+        # A multi-context surrogate has no fixed n; the caller supplies it
+        n = n if n is not None else surrogate_artifact["n"]
+        if n is None:
+            raise ValueError("Multi-context surrogate: pass the subgroup size n.")
+        sigma2 = sigma2 if sigma2 is not None else surrogate_artifact["sigma2"]
         print(f"Loaded surrogate context: n={n}, sigma2={sigma2}")
+        k1_hi = _k1_range(surrogate_artifact)[1]
+        if mode == "hybrid" and not surrogate_covers(surrogate_artifact, n, k1_max):
+            print(f"Surrogate does not cover n={n}, k1_max={k1_max}; screening exactly")
+        elif k1_max > k1_hi:
+            print(f"Warning: k1_max={k1_max} exceeds the surrogate's k1 range (<= {k1_hi}); "
+                  f"predictions above it are extrapolated")
     else:
         # Default defaults if no surrogate context
         # Ideally we read data config, but for now we assume defaults or use a config
-        n = 5
-        sigma2 = 1.0
-    
-    study = optuna.create_study(direction="minimize")
-    study.optimize(
-        lambda t: objective(t, mode, surrogate_artifact, target_arl0, shift, n, sigma2),
-        n_trials=n_trials
-    )
-    
-    best_params = study.best_params
-    best_value = study.best_value
+        n = 5 if n is None else n
+        sigma2 = 1.0 if sigma2 is None else sigma2
     
-    print("Best params:", best_params)
-    print("Best ARL1:", best_value)
-    
-    # Re-evaluate best params to get full stats
-    k1 = best_params["k1"]
-    k2 = best_params["k2"]
+    if mode == "hybrid":
+        k1, k2, exact_evaluations = hybrid_search(surrogate_artifact, n, sigma2, target_arl0, shift, k1_max=k1_max)
+        print("Best params:", {"k1": k1, "k2": k2})
+        print("Exact evaluations:", exact_evaluations)
+    else:
+        import optuna
+
+        study = optuna.create_study(direction="minimize")
+        study.optimize(
+            lambda t: objective(t, mode, surrogate_artifact, target_arl0, shift, n, sigma2, k1_max),
+            n_trials=n_trials
+        )
+        
+        best_params = study.best_params
+        best_value = study.best_value
+        
+        print("Best params:", best_params)
+        print("Best ARL1:", best_value)
+        
+        # Re-evaluate best params to get full stats
+        k1 = best_params["k1"]
+        k2 = best_params["k2"]
+        exact_evaluations = 2 * n_trials if mode == "analytical" else 0
     
     # Always verify with analytical at the end for reporting
     final_verify = simulator.overall_oc(sigma2, n, k1, k2, c=shift)
@@ -98,9 +204,21 @@ def run_optimization(mode, surrogate_path, out_path, n_trials=100, target_arl0=3
         "achieved_ARL1": final_verify["ARL"],
         "achieved_ARL0": final_arl0,
         "achieved_ASN": final_verify["ASN"],
-        "trials": n_trials
+        "n": n,
+        "trials": n_trials,
+        "exact_evaluations": exact_evaluations
     }
     
+    if mc_verify:
+        # Adaptive Monte Carlo check: stops as soon as ARL0 is clearly above/below
+        # target or the estimate is precise enough
+        mc0 = simulator.adaptive_ARL(sigma2, n, k1, k2, c=1.0, target=target_arl0, seed=0)
+        mc1 = simulator.adaptive_ARL(sigma2, n, k1, k2, c=shift, seed=1)
+        results["mc_verify"] = {"ARL0": mc0, "ARL1": mc1}
+        print(f"MC ARL0: {mc0['ARL']:.1f} ({mc0['runs_used']} runs, {mc0['censored']} censored, "
+              f"{mc0['stop_reason']}), "
+              f"MC ARL1: {mc1['ARL']:.2f} ({mc1['runs_used']} runs)")
+    
     # Append to file if exists (for comparison mode) or overwrite? 
     # For now, just write this result.
     # Actually, the user wants 'compare' mode in run_demo.sh.
@@ -111,24 +229,104 @@ def run_optimization(mode, surrogate_path, out_path, n_trials=100, target_arl0=3
     
     return results
 
-def main():
+def design_many(surrogate_artifact, n_values, target_arl0=370, shift=1.5, n_candidates=5000, top_m=50, seed=42):
+    """
+    Redesign one chart per subgroup size in n_values with a single surrogate prediction.
+    The same random (k1, k2) candidate set, drawn within the surrogate's training k1
+    range, is scored for every n at c=1.0 and c=shift;
+    the top_m candidates per n are then verified with one batched analytic call and the
+    best one that meets target_arl0 exactly is kept (the highest exact ARL0 if none does).
+    ARL and ASN do not depend on sigma2, so the designs apply to any in-control variance.
+    Returns a list of result dicts, one per n.
+    """
+    rng = np.random.RandomState(seed)
+    k1, k2 = _sample_designs(rng, n_candidates, *_k1_range(surrogate_artifact))
+    n_col = np.asarray(n_values, dtype=float)[:, None, None]
+    c_col = np.array([1.0, shift])[None, :, None]
+
+    # Shape (len(n_values), 2, n_candidates)
+    arl, _ = surrogate.predict(surrogate_artifact, k1[None, None, :], k2[None, None, :], c_col, n=n_col)
+    score = np.where(arl[:, 0, :] >= target_arl0, arl[:, 1, :], np.inf)
+    # Shape (len(n_values), top_m): best predicted candidates per n
+    top = np.argsort(score, axis=1)[:, :min(top_m, n_candidates)]
+
+    verify = simulator.overall_oc_batch(1.0, n_col, k1[top][:, None, :], k2[top][:, None, :], c_col)
+    exact_arl0, exact_arl1 = verify["ARL"][:, 0, :], verify["ARL"][:, 1, :]
+    passes = exact_arl0 >= target_arl0
+    pick = np.where(passes.any(axis=1),
+                    np.argmin(np.where(passes, exact_arl1, np.inf), axis=1),
+                    np.argmax(exact_arl0, axis=1))
+
+    results = []
+    for i, n in enumerate(n_values):
+        j = pick[i]
+        cand = top[i, j]
+        results.append({
+            "mode": "surrogate_batch",
+            "n": int(n),
+            "best_k1": float(k1[cand]),
+            "best_k2": float(k2[cand]),
+            "feasible": bool(exact_arl0[i, j] >= target_arl0),
+            "predicted_ARL1": float(arl[i, 1, cand]),
+            "achieved_ARL1": float(exact_arl1[i, j]),
+            "achieved_ARL0": float(exact_arl0[i, j]),
+            "achieved_ASN": float(verify["ASN"][i, 1, j]),
+            "candidates": n_candidates,
+            "verified": int(top.shape[1])
+        })
+    return results
+
+def main(argv=None):
     parser = argparse.ArgumentParser()
-    parser.add_argument("--mode", type=str, choices=["analytical", "surrogate", "compare"], required=True)
-    parser.add_argument("--surrogate", type=str, help="Path to surrogate model")
+    parser.add_argument("--mode", type=str, choices=["analytical", "surrogate", "hybrid", "compare"], required=True)
+    parser.add_argument("--surrogate", type=str,
+                        help="Path to surrogate model (optional for --mode hybrid, which then screens exactly)")
     parser.add_argument("--out", type=str, required=True)
     parser.add_argument("--trials", type=int, default=50)
-    args = parser.parse_args()
+    parser.add_argument("--n", type=int, help="Subgroup size (required for a multi-context surrogate)")
+    parser.add_argument("--target_arl0", type=float, default=370, help="Minimum in-control ARL")
+    parser.add_argument("--shift", type=float, default=1.5, help="Variance shift c to detect")
+    parser.add_argument("--k1_max", type=float, default=6.0,
+                        help="Upper bound for k1 (raise for high ARL0 targets)")
+    parser.add_argument("--mc_verify", action="store_true",
+                        help="Also verify the best design by adaptive Monte Carlo simulation")
+    parser.add_argument("--n_values", type=int, nargs="+",
+                        help="Surrogate mode only: redesign every listed n in one batched pass")
+    args = parser.parse_args(argv)
     
+    if args.mode in ("surrogate", "compare") and not args.surrogate:
+        parser.error(f"--mode {args.mode} requires --surrogate")
+    if args.surrogate and args.mode != "analytical" and args.n is None and not args.n_values:
+        import joblib
+        if joblib.load(args.surrogate)["n"] is None:
+            parser.error("--n is required with a multi-context surrogate")
+
     final_output = {}
     
-    if args.mode == "compare":
+    if args.n_values:
+        if args.mode != "surrogate":
+            parser.error("--n_values requires --mode surrogate")
+        import joblib
+        artifact = joblib.load(args.surrogate)
+        final_output["surrogate_batch"] = design_many(artifact, args.n_values, args.target_arl0, args.shift)
+    elif args.mode == "compare":
         # Run both
-        res_analytical = run_optimization("analytical", args.surrogate, args.out, n_trials=args.trials)
-        res_surrogate = run_optimization("surrogate", args.surrogate, args.out, n_trials=args.trials)
+        res_analytical = run_optimization("analytical", args.surrogate, args.out, n_trials=args.trials, n=args.n,
+                                          target_arl0=args.target_arl0, shift=args.shift, k1_max=args.k1_max,
+                                          mc_verify=args.mc_verify)
+        res_surrogate = run_optimization("surrogate", args.surrogate, args.out, n_trials=args.trials, n=args.n,
+                                         target_arl0=args.target_arl0, shift=args.shift, k1_max=args.k1_max,
+                                         mc_verify=args.mc_verify)
+        res_hybrid = run_optimization("hybrid", args.surrogate, args.out, n_trials=args.trials, n=args.n,
+                                      target_arl0=args.target_arl0, shift=args.shift, k1_max=args.k1_max,
+                                      mc_verify=args.mc_verify)
         final_output["analytical"] = res_analytical
         final_output["surrogate"] = res_surrogate
+        final_output["hybrid"] = res_hybrid
     else:
-        res = run_optimization(args.mode, args.surrogate, args.out, n_trials=args.trials)
+        res = run_optimization(args.mode, args.surrogate, args.out, n_trials=args.trials, n=args.n,
+                               target_arl0=args.target_arl0, shift=args.shift, k1_max=args.k1_max,
+                               mc_verify=args.mc_verify)
         final_output[args.mode] = res
         
     with open(args.out, "w") as f:
@@ -0,0 +1,239 @@
+"""
+Design evaluation service.
+Holds the surrogate and an exact-result cache once per host and serves design
+evaluations to many local processes over a JSON-lines TCP socket.
+
+Command-line usage:
+    python -m src.service --port 8765 --surrogate models/surrogate.joblib
+
+Protocol (one JSON object per line, one response line per request):
+    -> {"id": 1, "method": "exact", "designs": [{"n": 5, "k1": 4.37, "k2": 1.92, "c": 1.5}]}
+    <- {"id": 1, "results": [{"ARL": 30.73, "ASN": 5.89, ...}]}
+  method is "exact" (analytic overall_oc) or "surrogate" (requires --surrogate).
+  sigma2 may be given per design but does not change ARL/ASN.
+
+Notes:
+- Concurrent requests arriving within `window_ms` are coalesced into one
+  vectorized overall_oc_batch / surrogate.predict call, evaluated off the event loop.
+- Designs are validated per request before they are queued, and a failing batch is
+  re-run request by request, so one bad request cannot fail the others in its batch.
+- Exact results are memoized in a bounded LRU cache keyed by (n, k1, k2, c).
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from src import simulator
+
+
+class EvaluationServer:
+    """Batching evaluation server; one instance per host."""
+
+    def __init__(self, surrogate_path: Optional[str] = None, window_ms: float = 2.0,
+                 max_batch: int = 65536, cache_size: int = 100_000):
+        self.surrogate_artifact = None
+        if surrogate_path:
+            import joblib
+            self.surrogate_artifact = joblib.load(surrogate_path)
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.cache_size = cache_size
+        # (n, k1, k2, c) -> tuple of result values in self._fields order
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._fields: Optional[List[str]] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self.stats = {"requests": 0, "designs": 0, "batches": 0, "cache_hits": 0}
+
+    async def evaluate(self, designs: List[dict], method: str = "exact") -> List[Dict[str, float]]:
+        """Queue designs for the next batch and wait for their results."""
+        if method not in ("exact", "surrogate"):
+            raise ValueError(f"Unknown method {method}")
+        if method == "surrogate" and self.surrogate_artifact is None:
+            raise ValueError("Server was started without a surrogate.")
+        # Validate here so one bad request cannot fail a coalesced batch
+        designs = [self._validate(d, method) for d in designs]
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((method, designs, future))
+        return await future
+
+    def _validate(self, design: dict, method: str) -> Dict[str, float]:
+        """Convert one design to floats and check it can be evaluated by `method`."""
+        try:
+            row = {key: float(design[key]) for key in ("n", "k1", "k2")}
+            row["c"] = float(design.get("c", 1.0))
+        except (KeyError, TypeError, ValueError) as exc:
+            raise ValueError(f"Invalid design {design}: missing or non-numeric value ({exc})") from None
+        if not all(np.isfinite(v) for v in row.values()):
+            raise ValueError(f"Invalid design {design}: values must be finite")
+        if not (row["n"] > 1 and row["k1"] > row["k2"] and row["c"] > 0):
+            raise ValueError(f"Invalid design {design}: need n > 1, k1 > k2 and c > 0")
+        if method == "surrogate":
+            artifact = self.surrogate_artifact
+            if "n" in artifact["feature_names"]:
+                n_lo, n_hi = artifact["n_range"]
+                if not n_lo <= row["n"] <= n_hi:
+                    raise ValueError(f"Invalid design {design}: n outside the surrogate training range "
+                                     f"[{n_lo}, {n_hi}]")
+            elif row["n"] != artifact["n"]:
+                raise ValueError(f"Invalid design {design}: surrogate was trained for n={artifact['n']} only")
+        return row
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            size = len(pending[0][1])
+            # Collect everything that arrives within the batching window
+            deadline = loop.time() + self.window
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                size += len(item[1])
+
+            for method in ("exact", "surrogate"):
+                group = [p for p in pending if p[0] == method]
+                if not group:
+                    continue
+                flat = [d for _, designs, _ in group for d in designs]
+                try:
+                    results = await loop.run_in_executor(None, self._compute, method, flat)
+                except Exception:
+                    # Re-run each request alone so only the failing one gets the error
+                    for _, designs, future in group:
+                        try:
+                            result = await loop.run_in_executor(None, self._compute, method, designs)
+                        except Exception as exc:
+                            if not future.done():
+                                future.set_exception(exc)
+                        else:
+                            if not future.done():
+                                future.set_result(result)
+                    continue
+                start = 0
+                for _, designs, future in group:
+                    if not future.done():
+                        future.set_result(results[start:start + len(designs)])
+                    start += len(designs)
+            self.stats["batches"] += 1
+
+    def _compute(self, method: str, designs: List[dict]) -> List[Dict[str, float]]:
+        """Evaluate a flat list of designs with one vectorized call."""
+        n = np.array([d["n"] for d in designs], dtype=float)
+        k1 = np.array([d["k1"] for d in designs], dtype=float)
+        k2 = np.array([d["k2"] for d in designs], dtype=float)
+        c = np.array([d.get("c", 1.0) for d in designs], dtype=float)
+
+        if method == "surrogate":
+            from src import surrogate
+            arl, asn = surrogate.predict(self.surrogate_artifact, k1, k2, c, n=n)
+            return [{"ARL": float(a), "ASN": float(s)} for a, s in zip(arl, asn)]
+
+        keys = list(zip(n.tolist(), k1.tolist(), k2.tolist(), c.tolist()))
+        results: List[Optional[Dict[str, float]]] = [None] * len(keys)
+        miss = []
+        for i, key in enumerate(keys):
+            values = self._cache.get(key)
+            if values is None:
+                miss.append(i)
+            else:
+                self._cache.move_to_end(key)  # most recently used
+                results[i] = dict(zip(self._fields, values))
+        self.stats["cache_hits"] += len(keys) - len(miss)
+        if miss:
+            idx = np.array(miss)
+            res = simulator.overall_oc_batch(1.0, n[idx], k1[idx], k2[idx], c[idx])
+            self._fields = list(res)
+            columns = [res[field].tolist() for field in self._fields]
+            for j, i in enumerate(miss):
+                values = tuple(column[j] for column in columns)
+                results[i] = dict(zip(self._fields, values))
+                self._cache[keys[i]] = values
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return results
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = {}
+                try:
+                    request = json.loads(line)
+                    response["id"] = request.get("id")
+                    designs = request["designs"]
+                    self.stats["requests"] += 1
+                    self.stats["designs"] += len(designs)
+                    response["results"] = await self.evaluate(designs, request.get("method", "exact"))
+                except Exception as exc:
+                    response["error"] = f"{type(exc).__name__}: {exc}"
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765):
+        self._queue = asyncio.Queue()
+        batcher = asyncio.create_task(self._batcher())
+        server = await asyncio.start_server(self._handle, host, port, limit=2**26)
+        print(f"Evaluation server listening on {host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+class EvaluationClient:
+    """Minimal blocking client for the evaluation server."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765):
+        self._sock = socket.create_connection((host, port))
+        self._file = self._sock.makefile("rwb")
+        self._next_id = 0
+
+    def evaluate(self, designs: List[dict], method: str = "exact") -> List[Dict[str, float]]:
+        self._next_id += 1
+        request = {"id": self._next_id, "method": method, "designs": designs}
+        self._file.write(json.dumps(request).encode() + b"\n")
+        self._file.flush()
+        response = json.loads(self._file.readline())
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response["results"]
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve batched S^2 chart design evaluations on a local socket.")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--surrogate", type=str, help="Optional surrogate artifact to serve")
+    parser.add_argument("--window_ms", type=float, default=2.0, help="Batching window in milliseconds")
+    parser.add_argument("--cache_size", type=int, default=100_000, help="Maximum cached exact results (LRU)")
+    args = parser.parse_args(argv)
+
+    server = EvaluationServer(args.surrogate, window_ms=args.window_ms, cache_size=args.cache_size)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,24 @@ Functions:
 - control_limits(sigma2, n, k1, k2)
 - single_sample_probs(sigma2, n, k1, k2, c=1.0)
 - overall_oc(sigma2, n, k1, k2, c=1.0)
+- overall_oc_batch(sigma2, n, k1, k2, c=1.0)  # vectorized over any broadcastable inputs
 - simulate_run(S2_sequence, n, k1, k2)  # deterministic replay on a sequence
-- empirical_ARL_from_runs(runs, n, k1, k2) # compute empirical ARL across many runs
+- empirical_ARL_from_runs(runs, n, k1, k2) # vectorized replay of many runs (2-D array / .npy memmap)
+- simulate_run_lengths(sigma2, n, k1, k2, c, n_runs, max_length=None)  # Monte Carlo run lengths
+- adaptive_ARL(sigma2, n, k1, k2, c, target=None, max_length=10000)  # Monte Carlo ARL with sequential stopping
+
+Only numpy is imported at module load; scipy is imported on first use by the
+probability functions so that limit/decision consumers start fast.
 """
 
+import os
 import numpy as np
-from scipy.stats import chi2
-from typing import Sequence, Tuple, Dict
+from statistics import NormalDist
+from typing import Sequence, Tuple, Dict, Optional
+
+# Outcome codes returned by empirical_ARL_from_runs (index into OUTCOME_NAMES)
+OUTCOME_NO_SIGNAL, OUTCOME_IN, OUTCOME_OUT = 0, 1, 2
+OUTCOME_NAMES = ("no_signal", "in", "out")
 
 
 def control_limits(sigma2: float, n: int, k1: float, k2: float) -> Dict[str, float]:
@@ -35,35 +46,12 @@ def control_limits(sigma2: float, n: int, k1: float, k2: float) -> Dict[str, flo
 
 def single_sample_probs(sigma2: float, n: int, k1: float, k2: float, c: float = 1.0) -> Dict[str, float]:
     """
-    Compute single-sample probabilities using chi-square CDF when true variance is c*sigma2.
-    Returns {P1_out, P1_in, P_rep}.
+    Compute single-sample probabilities using the chi-square distribution when true variance is c*sigma2.
+    Returns {P1_out, P1_in, P_rep}. Tail-stable (see overall_oc_batch), so tail
+    probabilities far below machine epsilon are not lost to cancellation.
     """
-    df = n - 1
-    limits = control_limits(sigma2, n, k1, k2)
-    def G_of_T(T: float) -> float:
-        arg = (df * T) / (c * sigma2)
-        return chi2.cdf(arg, df) if arg >= 0 else 0.0
-
-    U1 = limits["UCL1"]
-    L1 = limits["LCL1"]
-    U2 = limits["UCL2"]
-    L2 = limits["LCL2"]
-
-    P_ge_U1 = 1.0 - G_of_T(U1)  # upper tail beyond UCL1
-    P_le_L1 = G_of_T(L1)        # lower tail below LCL1
-    P1_out = P_ge_U1 + P_le_L1
-
-    P1_in = G_of_T(U2) - G_of_T(L2)
-
-    P_left_rep = G_of_T(L2) - G_of_T(L1)
-    P_right_rep = G_of_T(U1) - G_of_T(U2)
-    P_rep = P_left_rep + P_right_rep
-
-    # Numeric clipping
-    P1_out = float(np.clip(P1_out, 0.0, 1.0))
-    P1_in = float(np.clip(P1_in, 0.0, 1.0))
-    P_rep = float(np.clip(P_rep, 0.0, 1.0))
-    return {"P1_out": P1_out, "P1_in": P1_in, "P_rep": P_rep}
+    res = overall_oc_batch(sigma2, n, k1, k2, c=c)
+    return {key: float(res[key]) for key in ("P1_out", "P1_in", "P_rep")}
 
 
 def overall_oc(sigma2: float, n: int, k1: float, k2: float, c: float = 1.0) -> Dict[str, float]:
@@ -74,16 +62,83 @@ def overall_oc(sigma2: float, n: int, k1: float, k2: float, c: float = 1.0) -> D
         ARL = 1 / P_out
     for process variance scaled by c.
     """
-    probs = single_sample_probs(sigma2, n, k1, k2, c=c)
-    P1_out = probs["P1_out"]
-    P_rep = probs["P_rep"]
-    denom = 1.0 - P_rep
-    if denom <= 0:
-        return {"P_out": np.inf, "ASN": np.inf, "ARL": np.inf, **probs}
-    P_out = P1_out / denom
-    ASN = n / denom
-    ARL = 1.0 / P_out if P_out > 0 else np.inf
-    return {"P_out": P_out, "ASN": ASN, "ARL": ARL, **probs}
+    res = overall_oc_batch(sigma2, n, k1, k2, c=c)
+    return {key: float(res[key]) for key in ("P_out", "ASN", "ARL", "P1_out", "P1_in", "P_rep")}
+
+
+def limit_arrays(sigma2, n, k1, k2) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized control_limits over broadcastable inputs.
+    Returns (UCL1, LCL1, UCL2, LCL2) arrays with the LCLs floored at 0.
+    """
+    sigma2, n, k1, k2 = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (sigma2, n, k1, k2)))
+    assert np.all(n > 1), "subgroup size n must be > 1"
+    assert np.all(k1 > k2), "outer limit k1 must be greater than inner limit k2"
+
+    sd_factor = np.sqrt(2.0 * (sigma2**2) / (n - 1))
+    UCL1 = sigma2 + k1 * sd_factor
+    LCL1 = np.maximum(0.0, sigma2 - k1 * sd_factor)
+    UCL2 = sigma2 + k2 * sd_factor
+    LCL2 = np.maximum(0.0, sigma2 - k2 * sd_factor)
+    return UCL1, LCL1, UCL2, LCL2
+
+
+def _chi2_tails(x, df) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (P(X <= x), P(X > x)) for X ~ chi2(df), elementwise.
+    Only the smaller tail is evaluated directly (regularized incomplete gamma below
+    the mean, its complement above) and the larger one is 1 - smaller, so the small
+    tail keeps full relative precision down to ~1e-308 instead of being lost to
+    1 - cdf cancellation. One special-function call per point.
+    """
+    from scipy.special import gammainc, gammaincc
+
+    x, df = np.broadcast_arrays(x, df)
+    upper = x >= df
+    small = np.empty(x.shape)
+    small[upper] = gammaincc(df[upper] / 2.0, x[upper] / 2.0)
+    small[~upper] = gammainc(df[~upper] / 2.0, x[~upper] / 2.0)
+    return np.where(upper, 1.0 - small, small), np.where(upper, small, 1.0 - small)
+
+
+def overall_oc_batch(sigma2, n, k1, k2, c=1.0) -> Dict[str, np.ndarray]:
+    """
+    Vectorized overall_oc: every argument may be a scalar or an array, and all are
+    broadcast together. One chi-square tail call per limit replaces the per-design
+    Python loop, so large design/shift grids are evaluated at NumPy speed.
+
+    Tail-stable: interval probabilities are differences of survival values when the
+    interval lies above the distribution mean and of CDF values otherwise, and
+    1 - P_rep is formed as P1_out + P1_in (the three events partition the line), so
+    ARL stays accurate far beyond 1e9 instead of collapsing to inf.
+    Returns the same keys as overall_oc plus log10_ARL, each an array of the
+    broadcast shape.
+    """
+    U1, L1, U2, L2 = limit_arrays(sigma2, n, k1, k2)
+    sigma2, n, c = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (sigma2, n, c)))
+    df = n - 1
+    scale = df / (c * sigma2)
+    # LCLs are floored at 0, so every argument is >= 0 and P(X <= 0) = 0
+    x, cdf, sf = {}, {}, {}
+    for name, T in (("U1", U1), ("L1", L1), ("U2", U2), ("L2", L2)):
+        x[name] = T * scale
+        cdf[name], sf[name] = _chi2_tails(x[name], df)
+
+    def interval(lo, hi):
+        return np.maximum(np.where(x[lo] >= df, sf[lo] - sf[hi], cdf[hi] - cdf[lo]), 0.0)
+
+    P1_out = sf["U1"] + cdf["L1"]
+    P1_in = interval("L2", "U2")
+    P_rep = np.minimum(interval("L1", "L2") + interval("U2", "U1"), 1.0)
+    denom = P1_out + P1_in  # = 1 - P_rep without cancellation
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        P_out = np.where(denom > 0, P1_out / denom, np.inf)
+        ASN = np.where(denom > 0, n / denom, np.inf)
+        ARL = np.where((denom > 0) & (P1_out > 0), denom / P1_out, np.inf)
+        log10_ARL = np.where((denom > 0) & (P1_out > 0), np.log10(denom) - np.log10(P1_out), np.inf)
+    return {"P_out": P_out, "ASN": ASN, "ARL": ARL, "P1_out": P1_out, "P1_in": P1_in, "P_rep": P_rep,
+            "log10_ARL": log10_ARL}
 
 
 def simulate_run(S2_sequence: Sequence[float], n: int, k1: float, k2: float) -> Tuple[int, str]:
@@ -112,22 +167,204 @@ def simulate_run(S2_sequence: Sequence[float], n: int, k1: float, k2: float) ->
     return len(S2_sequence), "no_signal"
 
 
-def empirical_ARL_from_runs(runs: Sequence[Sequence[float]], n: int, k1: float, k2: float, max_samples: int = 1000) -> Dict[str, float]:
-    """
-    Given many runs (each run is a sequence of S2 values), compute empirical ARL (mean samples to signal)
-    separately for in-control runs and shifted runs if runs are labeled; for simplicity this function returns
-    overall mean samples-to-out and counts.
-    Returns dict with {mean_samples_to_signal, prop_out, mean_samples_by_outcome}
-    """
-    samples = []
-    outcomes = []
-    for seq in runs:
-        samples_used, outcome = simulate_run(seq[:max_samples], n, k1, k2)
-        samples.append(samples_used)
-        outcomes.append(outcome)
-    samples = np.array(samples)
-    # mean excluding no_signal entries for ARL estimation (or treat as censored)
-    signaled_mask = np.array([o != "no_signal" for o in outcomes])
-    mean_samples = float(np.mean(samples[signaled_mask])) if signaled_mask.any() else np.inf
-    prop_out = float(np.sum([o == "out" for o in outcomes]) / len(outcomes))
-    return {"mean_samples": mean_samples, "prop_out": prop_out, "samples": samples, "outcomes": outcomes}
+def _as_run_matrix(runs, max_samples: int):
+    """
+    Normalize run input to a 2-D (n_runs, n_samples) array-like truncated to max_samples.
+    Paths to .npy files are memory-mapped; ndarrays/memmaps are sliced without copying;
+    ragged Python sequences are NaN-padded (NaN marks the end of a run).
+    """
+    if isinstance(runs, (str, os.PathLike)):
+        runs = np.load(runs, mmap_mode="r")
+    if isinstance(runs, np.ndarray):
+        if runs.ndim != 2:
+            raise ValueError(f"runs array must be 2-D (n_runs, n_samples), got shape {runs.shape}")
+        return runs[:, :max_samples]
+    runs = list(runs)
+    width = min(max_samples, max((len(seq) for seq in runs), default=0))
+    block = np.full((len(runs), width), np.nan)
+    for i, seq in enumerate(runs):
+        seq = np.asarray(seq[:max_samples], dtype=float)
+        block[i, :len(seq)] = seq
+    return block
+
+
+def _km_restricted_mean(durations: np.ndarray, events: np.ndarray) -> float:
+    """
+    Kaplan-Meier restricted mean of right-censored integer durations
+    (integral of the KM survival curve up to the largest observed duration).
+    Equals the plain mean when nothing is censored.
+    """
+    times, inverse = np.unique(durations, return_inverse=True)
+    d = np.bincount(inverse, weights=events.astype(float))
+    at_risk = np.bincount(inverse)[::-1].cumsum()[::-1]
+    surv = np.cumprod(1.0 - d / at_risk)
+    # S(t) is 1 before the first time and surv[j] on [times[j], times[j+1])
+    s_before = np.concatenate([[1.0], surv[:-1]])
+    widths = np.diff(np.concatenate([[0], times]))
+    return float(np.sum(s_before * widths))
+
+
+def empirical_ARL_from_runs(runs, n: int, k1: float, k2: float, max_samples: int = 1000,
+                            chunk_rows: int = 65536) -> Dict[str, object]:
+    """
+    Given many runs of S2 values, compute empirical mean samples to a terminal decision.
+    runs may be a 2-D float array (one run per row, NaN-padded if ragged), a np.memmap,
+    a path to a .npy file (memory-mapped), or a list of sequences. Rows are processed
+    in chunks of chunk_rows, so memory-mapped inputs are never loaded whole.
+    Returns dict with:
+        mean_samples: Kaplan-Meier restricted mean, treating no_signal runs as
+                      censored at their length (plain mean when nothing is censored)
+        mean_samples_signaled: mean over signaled runs only
+        prop_out, n_censored,
+        samples: int32 array of samples consumed per run,
+        outcomes: int8 array of OUTCOME_* codes (see OUTCOME_NAMES)
+    """
+    block = _as_run_matrix(runs, max_samples)
+    n_runs, width = block.shape
+    U1, L1, U2, L2 = (float(v) for v in limit_arrays(1.0, n, k1, k2))  # S2 scaled to nominal sigma2=1
+
+    samples = np.zeros(n_runs, dtype=np.int32)
+    outcomes = np.full(n_runs, OUTCOME_NO_SIGNAL, dtype=np.int8)
+    # With no columns every run is empty: zero samples, no_signal
+    for start in range(0, n_runs if width else 0, chunk_rows):
+        x = np.asarray(block[start:start + chunk_rows], dtype=float)
+        rows = np.arange(len(x))
+        out = (x >= U1) | (x <= L1)
+        terminal = out | ((x >= L2) & (x <= U2))  # NaN compares False: never terminal
+        first = np.argmax(terminal, axis=1)
+        signaled = terminal[rows, first]
+        missing = np.isnan(x)
+        length = np.where(missing.any(axis=1), np.argmax(missing, axis=1), width)
+        samples[start:start + len(x)] = np.where(signaled, first + 1, length)
+        outcomes[start:start + len(x)] = np.where(
+            signaled, np.where(out[rows, first], OUTCOME_OUT, OUTCOME_IN), OUTCOME_NO_SIGNAL)
+
+    signaled_mask = outcomes != OUTCOME_NO_SIGNAL
+    if signaled_mask.any():
+        mean_samples = _km_restricted_mean(samples, signaled_mask)
+        mean_signaled = float(np.mean(samples[signaled_mask]))
+    else:
+        mean_samples = mean_signaled = np.inf
+    prop_out = float(np.mean(outcomes == OUTCOME_OUT)) if n_runs else np.nan
+    return {
+        "mean_samples": mean_samples,
+        "mean_samples_signaled": mean_signaled,
+        "prop_out": prop_out,
+        "n_censored": int(n_runs - signaled_mask.sum()),
+        "samples": samples,
+        "outcomes": outcomes,
+    }
+
+
+def simulate_run_lengths(sigma2: float, n: int, k1: float, k2: float, c: float = 1.0, n_runs: int = 1000,
+                         rng: Optional[np.random.RandomState] = None,
+                         max_length: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Monte Carlo run lengths of the chart when the true variance is c*sigma2.
+    Each run draws S2 = c*sigma2*chi2(n-1)/(n-1) subgroups and applies the repetitive
+    sampling rule until an out-of-control signal. All active runs advance together in
+    blocks of subgroups whose width doubles each step (bounded to ~4M draws per step),
+    so long runs do not cost one Python iteration per subgroup.
+    With max_length, runs still without a signal after max_length decisions are stopped
+    (right-censored at max_length).
+    Returns (run_lengths, samples, signaled): decisions until the signal or censoring
+    (the quantity whose mean is the analytic ARL), subgroups drawn (int64 arrays of
+    length n_runs), and a bool array that is False for censored runs.
+    """
+    rng = np.random.RandomState() if rng is None else rng
+    df = n - 1
+    U1, L1, U2, L2 = (float(v) for v in limit_arrays(sigma2, n, k1, k2))
+
+    run_lengths = np.zeros(n_runs, dtype=np.int64)
+    samples = np.zeros(n_runs, dtype=np.int64)
+    signaled = np.zeros(n_runs, dtype=bool)
+    active = np.arange(n_runs)
+    width = 1
+    while active.size:
+        s2 = c * sigma2 * rng.chisquare(df, size=(active.size, width)) / df
+        out = (s2 >= U1) | (s2 <= L1)
+        terminal = out | ((s2 >= L2) & (s2 <= U2))
+        decisions = run_lengths[active, None] + np.cumsum(terminal, axis=1)
+        stop = out if max_length is None else out | (decisions >= max_length)
+        # Each run consumes its block up to the first stop (or the whole block)
+        stopped = stop.any(axis=1)
+        last = np.where(stopped, np.argmax(stop, axis=1), width - 1)
+        rows = np.arange(active.size)
+        samples[active] += last + 1
+        run_lengths[active] = decisions[rows, last]
+        signaled[active] = out[rows, last]
+        active = active[~stopped]
+        width = min(2 * width, max(1, 2 ** 22 // max(active.size, 1)))
+    return run_lengths, samples, signaled
+
+
+def adaptive_ARL(sigma2: float, n: int, k1: float, k2: float, c: float = 1.0, target: Optional[float] = None,
+                 rel_se: float = 0.05, batch_runs: int = 200, max_runs: int = 20000, alpha: float = 0.05,
+                 margin: float = 0.1, max_length: Optional[int] = 10000,
+                 seed: Optional[int] = None) -> Dict[str, object]:
+    """
+    Monte Carlo ARL estimate that adds batches of simulated runs until either
+      - the relative standard error of the ARL estimate is <= rel_se, or
+      - (if target is given) a Wald SPRT on the geometric run-length distribution
+        decides between ARL >= target*(1+margin) ("above") and
+        ARL <= target/(1+margin) ("below") at error rates alpha, or
+      - max_runs runs have been used.
+    Runs are capped at max_length decisions (None for no cap) so that high-ARL designs
+    finish; capped runs are treated as right-censored. Run lengths are geometric, so
+    the censored-geometric likelihood is used throughout: the ARL estimate is the
+    total number of decisions per signal (the plain mean when nothing is censored),
+    and censored runs enter the SPRT as survival terms.
+    Returns dict with ARL (inf if no run signaled), se, ci (1-alpha normal interval),
+    ASN, runs_used, samples_used, censored (runs stopped at max_length),
+    decision ("above", "below" or None) and stop_reason.
+    """
+    rng = np.random.RandomState(seed)
+    z = NormalDist().inv_cdf(1.0 - alpha / 2.0)
+    # SPRT thresholds and per-decision log-likelihood ratio terms for H_above vs H_below
+    if target is not None:
+        p_above = 1.0 / (target * (1.0 + margin))
+        p_below = (1.0 + margin) / target
+        log_a, log_b = np.log((1.0 - alpha) / alpha), np.log(alpha / (1.0 - alpha))
+        llr_signal = np.log(p_above / p_below)
+        llr_no_signal = np.log((1.0 - p_above) / (1.0 - p_below))
+    llr = 0.0
+
+    runs_used = signals = decisions = total_samples = 0
+    arl, se = np.inf, np.inf
+    decision, stop_reason = None, "max_runs"
+    while runs_used < max_runs:
+        batch, batch_samples, batch_signaled = simulate_run_lengths(
+            sigma2, n, k1, k2, c=c, n_runs=batch_runs, rng=rng, max_length=max_length)
+        runs_used += len(batch)
+        signals += int(batch_signaled.sum())
+        decisions += int(batch.sum())
+        total_samples += int(batch_samples.sum())
+        if signals:
+            # Censored-geometric MLE: p = signals / decisions, ARL = 1/p, se by the delta method
+            arl = decisions / signals
+            se = arl * np.sqrt((1.0 - signals / decisions) / signals)
+
+        if target is not None:
+            batch_signals = int(batch_signaled.sum())
+            llr += batch_signals * llr_signal + (int(batch.sum()) - batch_signals) * llr_no_signal
+            if llr >= log_a:
+                decision, stop_reason = "above", "sequential_test"
+                break
+            if llr <= log_b:
+                decision, stop_reason = "below", "sequential_test"
+                break
+        if signals > 1 and se <= rel_se * arl:
+            stop_reason = "precision"
+            break
+
+    return {
+        "ARL": float(arl),
+        "se": float(se),
+        "ci": [float(arl - z * se), float(arl + z * se)],
+        "ASN": n * total_samples / float(decisions),
+        "runs_used": runs_used,
+        "samples_used": total_samples,
+        "censored": runs_used - signals,
+        "decision": decision,
+        "stop_reason": stop_reason,
+    }
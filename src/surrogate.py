@@ -1,20 +1,59 @@
 """
 Surrogate modeling module.
 Trains a machine learning model to approximate the performance surface of the S^2 control chart.
-Maps (k1, k2, c) -> (ARL, ASN).
+Maps (k1, k2, c) -> (ARL, ASN), or (k1, k2, c, n) -> (ARL, ASN) for a multi-context model.
+
+ARL and ASN do not depend on sigma2 (the limits scale with it), so a model trained
+over a range of n serves every chart regardless of its in-control variance.
 """
 
 import argparse
+import os
 import numpy as np
-import pandas as pd
-import joblib
-from sklearn.ensemble import GradientBoostingRegressor
-from sklearn.multioutput import MultiOutputRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import max_error, mean_absolute_error
+from typing import Optional, Tuple
 from src import simulator
 
-def train_surrogate(data_path: str, out_path: str, n_samples: int = 2000, seed: int = 42):
+
+def predict(artifact: dict, k1, k2, c, n=None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Batched surrogate prediction for broadcastable k1, k2, c (and n).
+    Builds the feature matrix from artifact["feature_names"], so single-context
+    (k1, k2, c) and multi-context (k1, k2, c, n) artifacts are both supported.
+    Returns (ARL, ASN) arrays of the broadcast shape.
+    """
+    features = artifact["feature_names"]
+    if "n" in features:
+        if n is None:
+            raise ValueError("Multi-context surrogate needs the subgroup size n.")
+        n_lo, n_hi = artifact["n_range"]
+        if np.any((np.asarray(n) < n_lo) | (np.asarray(n) > n_hi)):
+            raise ValueError(f"n outside the surrogate training range [{n_lo}, {n_hi}].")
+    elif n is not None and np.any(np.asarray(n) != artifact["n"]):
+        raise ValueError(f"Surrogate was trained for n={artifact['n']} only.")
+    columns = {"k1": k1, "k2": k2, "c": c, "n": n if n is not None else artifact["n"]}
+    arrays = np.broadcast_arrays(*(np.asarray(columns[name], dtype=float) for name in features))
+    shape = arrays[0].shape
+    X = np.column_stack([a.ravel() for a in arrays])
+    pred = artifact["model"].predict(X)
+    return (10 ** pred[:, 0]).reshape(shape), pred[:, 1].reshape(shape)
+
+
+def train_surrogate(data_path: str, out_path: str, n_samples: int = 2000, seed: int = 42, n_jobs: int = -1,
+                    n_range: Optional[Tuple[int, int]] = None, k1_range: Tuple[float, float] = (1.5, 6.0)):
+    """
+    Train the surrogate on analytic labels. With n_range=(n_min, n_max) the subgroup
+    size is sampled as a feature too, producing one model for every chart context.
+    k1 is sampled over k1_range, which is stored in the artifact so callers can tell
+    when a search would extrapolate beyond the training data.
+    """
+    import pandas as pd
+    import joblib
+    from joblib import effective_n_jobs, parallel_backend
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    from sklearn.multioutput import MultiOutputRegressor
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import mean_absolute_error
+
     print(f"Loading data from {data_path} to infer process parameters...")
     df = pd.read_csv(data_path)
     
@@ -31,61 +70,56 @@ def train_surrogate(data_path: str, out_path: str, n_samples: int = 2000, seed:
     n = int(ic_data["n"].mode()[0])
     
     print(f"Estimated sigma2: {sigma2_est:.4f}, n: {n}")
+    if n_range is not None:
+        print(f"Training multi-context surrogate over n in [{n_range[0]}, {n_range[1]}]")
     
     # Generate training data covering the design space
-    # k1 in [1.5, 6.0], k2 in [0.5, k1 - 0.1]
+    # k1 in k1_range (default [1.5, 6.0]), k2 in [0.1, k1 - 0.1]
     # c in [0.5, 3.0] (covering decreases and increases)
     
     rng = np.random.RandomState(seed)
     
-    X = []
-    y = []
-    
     print(f"Generating {n_samples} training samples...")
-    for _ in range(n_samples):
-        k1 = rng.uniform(1.5, 6.0)
-        # k2 must be strictly less than k1. 
-        # We also want k2 to be reasonable, say > 0.
-        k2 = rng.uniform(0.1, k1 - 0.1)
-        
-        # Shift coefficient c. 
-        # We want to learn both in-control (c=1) and out-of-control.
-        # Let's mix: 20% c=1, 80% c sampled from range.
-        if rng.rand() < 0.2:
-            c = 1.0
-        else:
-            # Sample c from [0.5, 3.0], excluding ~1.0 maybe? 
-            # Continuous range is fine, the model handles it.
-            c = rng.uniform(0.5, 3.0)
-            
-        # Calculate Ground Truth
-        # Note: We use the estimated sigma2 and n from data relative to the chart design
-        results = simulator.overall_oc(sigma2=sigma2_est, n=n, k1=k1, k2=k2, c=c)
-        
-        # Features: k1, k2, c
-        # Targets: log10(ARL), log10(ASN) -> Log transform usually helps with ARL scaling
-        # However, for simplicity let's predict raw first, or log. ARL blows up at c=1.
-        # Let's predict log10(ARL) because it varies spanning orders of magnitude.
-        
-        arl = results["ARL"]
-        asn = results["ASN"]
-        
-        if np.isinf(arl):
-            arl = 1e6 # cap
-            
-        X.append([k1, k2, c])
-        y.append([np.log10(arl), asn])
-        
-    X = np.array(X)
-    y = np.array(y)
+    k1 = rng.uniform(k1_range[0], k1_range[1], size=n_samples)
+    # k2 must be strictly less than k1. 
+    k2 = rng.uniform(0.1, k1 - 0.1)
+    # We want to learn both in-control (c=1) and out-of-control.
+    # Mix: 20% c=1, 80% c sampled from [0.5, 3.0].
+    c = np.where(rng.rand(n_samples) < 0.2, 1.0, rng.uniform(0.5, 3.0, size=n_samples))
+    # Multi-context: subgroup size becomes a sampled feature
+    n_feature = n if n_range is None else rng.randint(n_range[0], n_range[1] + 1, size=n_samples)
+    
+    # Ground truth for all samples in one batched call
+    # Note: We use the estimated sigma2 and n from data relative to the chart design
+    results = simulator.overall_oc_batch(sigma2=sigma2_est, n=n_feature, k1=k1, k2=k2, c=c)
+    
+    # Targets: log10(ARL) because it spans orders of magnitude, and ASN.
+    # log10_ARL stays accurate far into the tails, so labels are not capped;
+    # designs whose ARL overflows double precision are dropped instead.
+    feature_names = ["k1", "k2", "c"] if n_range is None else ["k1", "k2", "c", "n"]
+    X = np.column_stack([k1, k2, c] if n_range is None else [k1, k2, c, n_feature])
+    y = np.column_stack([results["log10_ARL"], results["ASN"]])
+    finite = np.isfinite(y).all(axis=1)
+    if not finite.all():
+        print(f"Dropping {int((~finite).sum())} samples with non-finite ARL/ASN labels")
+        X, y = X[finite], y[finite]
     
     # Train Model
-    # We use Gradient Boosting as it handles non-linearities well.
+    # Histogram-based gradient boosting handles non-linearities well and fits
+    # 1e5+ samples in seconds; the two outputs are fitted in parallel.
     print("Training surrogate model...")
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=seed)
     
-    model = MultiOutputRegressor(GradientBoostingRegressor(n_estimators=200, max_depth=5, random_state=seed))
-    model.fit(X_train, y_train)
+    # At most one worker per output; HGB's OpenMP threads are split between the
+    # workers so the nested pools do not oversubscribe the CPU.
+    workers = max(1, min(y.shape[1], effective_n_jobs(n_jobs)))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    model = MultiOutputRegressor(
+        HistGradientBoostingRegressor(max_iter=200, max_leaf_nodes=31, random_state=seed),
+        n_jobs=workers,
+    )
+    with parallel_backend("loky", inner_max_num_threads=threads):
+        model.fit(X_train, y_train)
     
     # Validate
     score = model.score(X_test, y_test)
@@ -97,27 +131,37 @@ def train_surrogate(data_path: str, out_path: str, n_samples: int = 2000, seed:
     print(f"MAE log10(ARL): {mae_log_arl:.4f}")
     print(f"MAE ASN: {mae_asn:.4f}")
     
-    # Save metadata along with model (n, sigma2_est) so optimizer knows context
+    # Save metadata along with model (n, sigma2_est) so optimizer knows context.
+    # Multi-context models carry n_range instead of a single n.
     artifact = {
         "model": model,
-        "n": n,
+        "n": n if n_range is None else None,
+        "n_range": None if n_range is None else [int(n_range[0]), int(n_range[1])],
+        "k1_range": [float(k1_range[0]), float(k1_range[1])],
         "sigma2": sigma2_est,
-        "feature_names": ["k1", "k2", "c"],
+        "feature_names": feature_names,
         "target_names": ["log10_ARL", "ASN"]
     }
     
     joblib.dump(artifact, out_path)
     print(f"Saved surrogate interface to {out_path}")
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument("--data", required=True, help="Path to historical data")
     parser.add_argument("--out", required=True, help="Path to save model")
     parser.add_argument("--n_samples", type=int, default=2000)
     parser.add_argument("--seed", type=int, default=42)
-    args = parser.parse_args()
+    parser.add_argument("--n_jobs", type=int, default=-1, help="Parallel jobs for fitting the outputs (at most one per output; -1 = one per output)")
+    parser.add_argument("--n_range", type=int, nargs=2, metavar=("N_MIN", "N_MAX"),
+                        help="Train a multi-context surrogate with n as a feature over [N_MIN, N_MAX]")
+    parser.add_argument("--k1_range", type=float, nargs=2, metavar=("K1_MIN", "K1_MAX"), default=(1.5, 6.0),
+                        help="Range of outer limit multipliers k1 to sample for training")
+    args = parser.parse_args(argv)
+    if not 0.2 < args.k1_range[0] < args.k1_range[1]:
+        parser.error("--k1_range needs 0.2 < K1_MIN < K1_MAX")
     
-    train_surrogate(args.data, args.out, args.n_samples, args.seed)
+    train_surrogate(args.data, args.out, args.n_samples, args.seed, args.n_jobs, args.n_range, args.k1_range)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,58 @@
+
+import sys
+import os
+import tempfile
+sys.path.append(os.getcwd())
+import numpy as np
+from src import simulator
+
+# A narrow inner band makes repeats common, so short runs often end without a decision
+n, k1, k2 = 5, 4.37021, 0.5
+rng = np.random.RandomState(0)
+runs = [list(rng.chisquare(n - 1, size=rng.randint(0, 7)) / (n - 1)) for _ in range(5000)]
+
+failures = 0
+
+# 1. Vectorized replay matches the scalar decision rule run by run (ragged input)
+res = simulator.empirical_ARL_from_runs(runs, n, k1, k2, chunk_rows=999)
+expected = [simulator.simulate_run(seq, n, k1, k2) for seq in runs]
+samples = np.array([s for s, _ in expected])
+outcomes = np.array([simulator.OUTCOME_NAMES.index(o) for _, o in expected])
+ok = np.array_equal(res["samples"], samples) and np.array_equal(res["outcomes"], outcomes)
+failures += not ok
+print(f"Ragged replay vs simulate_run ({len(runs)} runs, {res['n_censored']} censored): {'OK' if ok else 'FAIL'}")
+
+# 2. The memory-mapped .npy path gives the same result as the in-memory array
+block = np.full((len(runs), 6), np.nan)
+for i, seq in enumerate(runs):
+    block[i, :len(seq)] = seq
+with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "runs.npy")
+    np.save(path, block)
+    res_mm = simulator.empirical_ARL_from_runs(path, n, k1, k2)
+    ok = (np.array_equal(res_mm["samples"], res["samples"])
+          and np.array_equal(res_mm["outcomes"], res["outcomes"])
+          and res_mm["mean_samples"] == res["mean_samples"])
+failures += not ok
+print(f"Memory-mapped .npy replay: {'OK' if ok else 'FAIL'}")
+
+# 3. Kaplan-Meier restricted mean on a hand-computed example:
+#    durations 2, 3+, 3, 5 (3+ censored): S = 1, 0.75, 0.5, 0 on [0,2), [2,3), [3,5), [5,...)
+#    -> 2*1 + 1*0.75 + 2*0.5 = 3.75; with no censoring it is the plain mean
+km = simulator._km_restricted_mean(np.array([2, 3, 3, 5]), np.array([True, False, True, True]))
+km_plain = simulator._km_restricted_mean(np.array([1, 2, 6]), np.array([True, True, True]))
+ok = abs(km - 3.75) < 1e-12 and abs(km_plain - 3.0) < 1e-12
+failures += not ok
+print(f"KM restricted mean: {km} (expected 3.75), {km_plain} (expected 3.0) {'OK' if ok else 'FAIL'}")
+
+# 4. Empty runs: zero samples, no_signal
+for empty in ([[]], [[], []], np.empty((3, 0))):
+    res_empty = simulator.empirical_ARL_from_runs(empty, n, k1, k2)
+    ok = (not res_empty["samples"].any()
+          and np.all(res_empty["outcomes"] == simulator.OUTCOME_NO_SIGNAL)
+          and res_empty["n_censored"] == len(res_empty["samples"]))
+    failures += not ok
+    print(f"Empty input {np.shape(empty)}: {'OK' if ok else 'FAIL'}")
+
+print("All replay checks passed." if not failures else f"{failures} replay check(s) FAILED.")
+sys.exit(1 if failures else 0)
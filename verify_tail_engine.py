@@ -0,0 +1,39 @@
+
+import sys
+import os
+sys.path.append(os.getcwd())
+import numpy as np
+from src import simulator
+
+# Reference ARLs computed with mpmath (50 significant digits) from the regularized
+# incomplete gamma function: ARL = (P1_out + P1_in) / P1_out
+# (n, k1, k2, c) -> ARL
+REFERENCE = {
+    (5, 4.37021, 1.92006, 1.0): 369.99823445564421,
+    (5, 30.0, 2.0, 1.0): 4.1314265406826795e+17,
+    (5, 10.58, 1.28, 1.0): 1136576.3684525629,
+    (10, 20.0, 1.0, 1.0): 2568149671168634.4,
+    (3, 6.0, 1.0, 0.5): 1180578.8183699701,
+}
+REL_TOL = 1e-12
+
+failures = 0
+designs = np.array(list(REFERENCE))
+batch = simulator.overall_oc_batch(1.0, designs[:, 0], designs[:, 1], designs[:, 2], designs[:, 3])
+for i, ((n, k1, k2, c), ref) in enumerate(REFERENCE.items()):
+    arl = simulator.overall_oc(1.0, n, k1, k2, c=c)["ARL"]
+    rel_err = abs(arl - ref) / ref
+    ok = (np.isfinite(arl) and rel_err <= REL_TOL and arl == batch["ARL"][i]
+          and abs(batch["log10_ARL"][i] - np.log10(ref)) <= REL_TOL * np.log10(ref))
+    failures += not ok
+    print(f"n={n:<3} k1={k1:<8} k2={k2:<8} c={c:<4} ARL={arl:.17g} rel_err={rel_err:.2e} {'OK' if ok else 'FAIL'}")
+
+# Probabilities stay valid and ARL decreases with the shift deep in the tail
+res = simulator.overall_oc_batch(1.0, 5, 30.0, 2.0, np.array([1.0, 1.5, 3.0]))
+ok = (np.all(np.isfinite(res["ARL"])) and np.all(np.diff(res["ARL"]) < 0)
+      and np.allclose(res["P1_out"] + res["P1_in"] + res["P_rep"], 1.0))
+failures += not ok
+print(f"Tail monotonicity (n=5, k1=30, k2=2): {res['ARL']} {'OK' if ok else 'FAIL'}")
+
+print("All tail checks passed." if not failures else f"{failures} tail check(s) FAILED.")
+sys.exit(1 if failures else 0)